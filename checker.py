@@ -1,34 +1,27 @@
 #!/usr/bin/env -S python3
-import sys, os, subprocess, shutil
+import sys, os, subprocess, shutil, functools, json, itertools, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple
 import difflib
 
-# ANSI color codes
+# ANSI color codes — resolved once at class creation: empty strings for
+# non-TTY output, so there is no per-call (or reflection-based) disabling
 class Colors:
-    RESET = '\033[0m'
-    BOLD = '\033[1m'
-    DIM = '\033[2m'
+    _on = sys.stdout.isatty()
+
+    RESET = '\033[0m' if _on else ''
+    BOLD = '\033[1m' if _on else ''
+    DIM = '\033[2m' if _on else ''
 
     # Colors
-    RED = '\033[91m'
-    GREEN = '\033[92m'
-    YELLOW = '\033[93m'
-    BLUE = '\033[94m'
-    MAGENTA = '\033[95m'
-    CYAN = '\033[96m'
-    WHITE = '\033[97m'
-    GRAY = '\033[90m'
-
-    @staticmethod
-    def disable():
-        """Disable colors for non-TTY environments"""
-        for attr in dir(Colors):
-            if not attr.startswith('_') and attr.isupper() and attr not in ['disable']:
-                setattr(Colors, attr, '')
-
-# Disable colors if not outputting to a terminal
-if not sys.stdout.isatty():
-    Colors.disable()
+    RED = '\033[91m' if _on else ''
+    GREEN = '\033[92m' if _on else ''
+    YELLOW = '\033[93m' if _on else ''
+    BLUE = '\033[94m' if _on else ''
+    MAGENTA = '\033[95m' if _on else ''
+    CYAN = '\033[96m' if _on else ''
+    WHITE = '\033[97m' if _on else ''
+    GRAY = '\033[90m' if _on else ''
 
 # Modern Unicode icons
 ICON_SUCCESS = f"{Colors.GREEN}●{Colors.RESET}"
@@ -47,42 +40,196 @@ else:
     ROOTS = args or ['.']
     EXTRA_FLAGS = []
 
+# Shared pool for per-file tool invocations; the work is subprocess-wait
+# bound, so threads give near-linear speedup in min(cores, files).
+EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+# Files per tool invocation: amortizes fork/exec + tool startup across
+# many files while still leaving enough chunks to keep the pool busy.
+BATCH_SIZE = 32
+
+def _chunks(xs: List[str], n: int = BATCH_SIZE):
+    for i in range(0, len(xs), n):
+        yield xs[i:i + n]
+
+def _group_by_file(out: str, files: List[str]) -> dict:
+    """Attribute batched tool output lines back to individual files.
+
+    Diagnostic lines start with 'path:line:...'; continuation lines are
+    attached to the most recently seen file.
+    """
+    lookup = {}
+    for f in files:
+        lookup[f] = f
+        lookup[os.path.abspath(f)] = f
+    grouped: dict = {}
+    current = None
+    for line in out.splitlines():
+        head = line.split(':', 1)[0]
+        f = lookup.get(head)
+        if f is not None:
+            current = f
+        if current is not None and line.strip():
+            grouped.setdefault(current, []).append(line)
+    return grouped
+
+@functools.lru_cache(maxsize=None)
 def which(name):
     return shutil.which(name)
 
-def run(cmd):
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    return p.returncode, p.stdout + p.stderr
-
-def print_header():
+# ── incremental re-check cache ───────────────────────────────────────────────
+# Maps tool → {path: [mtime_ns, size, tool_version, config_stamp]} for files
+# that passed on the previous run; unchanged passing files are skipped
+# entirely.  The config stamp covers the tool's own config files (and, for
+# clang-tidy, the effective extra flags), so editing .clang-format or
+# CPPLINT.cfg invalidates old verdicts just like editing the source would.
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'cquality.json')
+CACHE: dict = {}
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_PATH) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache: dict):
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp = CACHE_PATH + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(cache, fh)
+        os.replace(tmp, CACHE_PATH)
+    except OSError:
+        pass
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool: str) -> str:
+    rc, out = run([tool, '--version'])
+    return out.strip().splitlines()[0] if out.strip() else ''
+
+# Config files whose content changes a tool's verdict without touching
+# the sources; looked up in the checked roots and the working directory.
+TOOL_CONFIGS = {
+    'clang-format': ('.clang-format', '_clang-format'),
+    'clang-tidy': ('.clang-tidy',),
+    'cpplint': ('CPPLINT.cfg',),
+}
+
+@functools.lru_cache(maxsize=None)
+def _config_stamp(tool: str) -> str:
+    """Fingerprint of the tool's config files and effective flags."""
+    dirs = {'.'}
+    for root in ROOTS:
+        dirs.add(root if os.path.isdir(root) else (os.path.dirname(root) or '.'))
+    parts = []
+    for name in TOOL_CONFIGS.get(tool, ()):
+        for d in sorted(dirs):
+            p = os.path.join(d, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            parts.append(f'{p}:{st.st_mtime_ns}:{st.st_size}')
+    if tool == 'clang-tidy':
+        # Flag changes (or a compile DB appearing) alter the diagnostics
+        # as much as a config edit does.
+        parts.append('flags=' + ' '.join(EXTRA_FLAGS))
+        parts.append('db=' + _find_compile_db(ROOTS))
+    return '|'.join(parts)
+
+def partition_cached(tool: str, files: List[str]) -> Tuple[List[str], List[str]]:
+    """Split files into (fresh, stale): fresh passed last run and are unchanged."""
+    entries = CACHE.get(tool, {})
+    ver = tool_version(tool)
+    stamp = _config_stamp(tool)
+    fresh, stale = [], []
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            stale.append(f)
+            continue
+        e = entries.get(f)
+        # Entries from before the config stamp existed have length 3 and
+        # are treated as stale.
+        if (e and len(e) == 4 and e[0] == st.st_mtime_ns
+                and e[1] == st.st_size and e[2] == ver and e[3] == stamp):
+            fresh.append(f)
+        else:
+            stale.append(f)
+    return fresh, stale
+
+def record_passed(tool: str, files: List[str]):
+    """Remember passing files so unchanged ones are skipped next run."""
+    entries = CACHE.setdefault(tool, {})
+    ver = tool_version(tool)
+    stamp = _config_stamp(tool)
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            entries.pop(f, None)
+            continue
+        entries[f] = [st.st_mtime_ns, st.st_size, ver, stamp]
+
+# close_fds=False skips the /proc/self/fd scan on every spawn and lets
+# CPython use posix_spawn; with env passed explicitly the child setup is
+# as cheap as it gets. Multiplied by hundreds of tool invocations.
+_SPAWN_KWARGS = dict(close_fds=False, env=os.environ)
+
+def run(cmd, env=None):
+    # Interleave stderr into stdout at the pipe level: one buffer, one
+    # decode, no O(len) concatenation of two captured strings.
+    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                       text=True, close_fds=False,
+                       env=env if env is not None else os.environ)
+    return p.returncode, p.stdout
+
+def print_header(n_files: int):
     """Print a minimal, modern header"""
-    print(f"\n{Colors.BOLD}{Colors.CYAN}C/C++ Code Quality{Colors.RESET} {Colors.DIM}({len(find_sources(ROOTS))} files){Colors.RESET}")
+    print(f"\n{Colors.BOLD}{Colors.CYAN}C/C++ Code Quality{Colors.RESET} {Colors.DIM}({n_files} files){Colors.RESET}")
+
+# Per-thread capture buffer: checks running concurrently append here so
+# their sections can be flushed to stdout in a fixed order afterwards.
+_local = threading.local()
+
+def _emit(s: str):
+    buf = getattr(_local, 'buf', None)
+    if buf is not None:
+        buf.append(s)
+    else:
+        sys.stdout.write(s)
 
 def print_section(tool_name: str):
     """Print a clean section header for each tool"""
     # Pad tool name to align results
     padded = f"{tool_name:<15}"
-    print(f"  {Colors.DIM}{padded}{Colors.RESET}", end=" ")
+    _emit(f"  {Colors.DIM}{padded}{Colors.RESET} ")
 
 def print_success():
     """Print inline success indicator"""
-    print(f"{ICON_SUCCESS}")
+    _emit(f"{ICON_SUCCESS}\n")
 
 def print_error(count: int):
     """Print inline error indicator with count"""
-    print(f"{ICON_ERROR} {Colors.RED}{count} issue{'s' if count != 1 else ''}{Colors.RESET}")
+    _emit(f"{ICON_ERROR} {Colors.RED}{count} issue{'s' if count != 1 else ''}{Colors.RESET}\n")
 
 def print_skip():
     """Print inline skip indicator"""
-    print(f"{ICON_SKIP} {Colors.DIM}skipped{Colors.RESET}")
+    _emit(f"{ICON_SKIP} {Colors.DIM}skipped{Colors.RESET}\n")
 
 def print_file_issue(filename: str, details: str):
-    """Print file-specific issues with minimal formatting"""
-    print(f"\n  {Colors.DIM}├─{Colors.RESET} {Colors.WHITE}{filename}{Colors.RESET}")
-    for line in details.split('\n'):
-        if line.strip():
-            print(f"  {Colors.DIM}│{Colors.RESET}  {Colors.DIM}{line}{Colors.RESET}")
-    print(f"  {Colors.DIM}╰─{Colors.RESET}")
+    """Print file-specific issues with minimal formatting.
+
+    The whole block goes out in one write: a print per diagnostic line
+    means a stdio lock + write syscall each, thousands on chatty runs."""
+    parts = [f"\n  {Colors.DIM}├─{Colors.RESET} {Colors.WHITE}{filename}{Colors.RESET}"]
+    parts.extend(
+        f"  {Colors.DIM}│{Colors.RESET}  {Colors.DIM}{line}{Colors.RESET}"
+        for line in details.split('\n') if line.strip())
+    parts.append(f"  {Colors.DIM}╰─{Colors.RESET}")
+    _emit("\n".join(parts) + "\n")
 
 def print_summary(total_checks: int, passed: int, failed: int, skipped: int):
     """Print a compact summary"""
@@ -93,21 +240,79 @@ def print_summary(total_checks: int, passed: int, failed: int, skipped: int):
         status += f" {Colors.DIM}/{Colors.RESET} {Colors.GRAY}{skipped}{Colors.RESET}"
     print(f"{status} {Colors.DIM}passed/failed/skipped{Colors.RESET}\n")
 
+EXT_SET = frozenset({'.c', '.cpp', '.cc', '.cxx', '.h', '.hpp', '.hh'})
+
+def _is_source(name: str) -> bool:
+    # Lowercase only the suffix: O(len(extension)) set probe instead of
+    # lowercasing the whole name for the common mismatch case.
+    dot = name.rfind('.')
+    return dot >= 0 and name[dot:].lower() in EXT_SET
+
 def find_sources(roots: List[str]) -> List[str]:
     """Find C/C++ source files in the given roots"""
-    exts = ('.c', '.cpp', '.cc', '.cxx', '.h', '.hpp', '.hh')
     files = []
     for root in roots:
         if os.path.isfile(root):
-            if root.lower().endswith(exts):
+            if _is_source(root):
                 files.append(root)
             continue
-        for dp, _, fnames in os.walk(root):
-            for f in fnames:
-                if f.lower().endswith(exts):
-                    files.append(os.path.join(dp, f))
+        # scandir exposes the readdir d_type, so classifying entries as
+        # dir vs file needs no extra stat call per entry (unlike os.walk).
+        # seen guards against revisiting a directory through bind mounts
+        # or junction-style cycles; DirEntry.stat caches, so the common
+        # file path stays stat-free.
+        stack = [root]
+        seen = set()
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for de in it:
+                    if de.is_dir(follow_symlinks=False):
+                        try:
+                            s = de.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        key = (s.st_dev, s.st_ino)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        stack.append(de.path)
+                    elif _is_source(de.name):
+                        files.append(de.path)
     return files
 
+def _external_diff(f: str, formatted: str) -> List[str]:
+    """First 20 unified-diff lines between f and its formatted text.
+
+    GNU diff (C, Myers algorithm) is much faster than difflib on large
+    reformat diffs; the formatted text goes through a temp file."""
+    with tempfile.NamedTemporaryFile('w', suffix=os.path.basename(f)) as tmp:
+        tmp.write(formatted)
+        tmp.flush()
+        _, out = run(['diff', '-u',
+                      '--label', f, '--label', f + " (formatted)",
+                      f, tmp.name])
+    return out.splitlines()[:20]
+
+def _difflib_diff(f: str, formatted: str) -> List[str]:
+    """difflib fallback for systems without a diff binary."""
+    try:
+        with open(f, 'r', encoding='utf-8', errors='replace') as fh:
+            original = fh.read().splitlines()
+    except Exception as e:
+        return [f"Could not read file: {e}"]
+    # unified_diff is a generator; islice stops the matcher as soon as
+    # the 20 printed lines exist instead of diffing the whole file
+    return list(itertools.islice(
+        difflib.unified_diff(original, formatted.splitlines(),
+                             fromfile=f,
+                             tofile=f + " (formatted)",
+                             lineterm=''),
+        20))
+
 def check_clang_format(files: List[str]) -> Tuple[int, int]:
     """Check code formatting with clang-format"""
     print_section("clang-format")
@@ -116,35 +321,52 @@ def check_clang_format(files: List[str]) -> Tuple[int, int]:
         print_skip()
         return 0, 1
 
-    issues = []
-    for f in files:
-        rc, out = run(['clang-format', '--output-replacements-xml', f])
-        if '<replacement ' in out:
-            issues.append(f)
+    _, files = partition_cached('clang-format', files)
+
+    # Pass 1: batched detection — --dry-run -Werror exits non-zero if any
+    # file in the chunk needs formatting, with no XML to parse.
+    flagged_chunks = [
+        chunk for chunk, rc in EXECUTOR.map(
+            lambda c: (c, run(['clang-format', '--dry-run', '-Werror'] + c)[0]),
+            _chunks(files))
+        if rc != 0
+    ]
+    # Pass 2: narrow flagged chunks down to individual files.
+    suspects = [f for chunk in flagged_chunks for f in chunk]
+    results = EXECUTOR.map(
+        lambda f: (f, run(['clang-format', '--dry-run', '-Werror', f])[0]),
+        suspects)
+    issues = [f for f, rc in results if rc != 0]
+    bad = set(issues)
+    record_passed('clang-format', [f for f in files if f not in bad])
 
     if issues:
         print_error(len(issues))
-        for f in issues:
+        formatted_outputs = EXECUTOR.map(
+            lambda f: run(['clang-format', f])[1], issues)
+        use_ext_diff = which('diff') is not None
+        for f, formatted in zip(issues, formatted_outputs):
             # produce a unified diff between original and clang-format output
-            try:
-                with open(f, 'r', encoding='utf-8', errors='replace') as fh:
-                    original = fh.read().splitlines()
-            except Exception as e:
-                print_file_issue(f, f"Could not read file: {e}")
-                continue
-            rc2, formatted = run(['clang-format', f])
-            formatted_lines = formatted.splitlines()
-            diff_lines = list(difflib.unified_diff(original, formatted_lines,
-                                                   fromfile=f,
-                                                   tofile=f + " (formatted)",
-                                                   lineterm=''))
-            if diff_lines:
-                print_file_issue(f, "\n".join(diff_lines[:20]))  # Limit diff output
+            if use_ext_diff:
+                diff_head = _external_diff(f, formatted)
+            else:
+                diff_head = _difflib_diff(f, formatted)
+            if diff_head:
+                print_file_issue(f, "\n".join(diff_head))
         return 1, 0
 
     print_success()
     return 0, 0
 
+def _find_compile_db(roots: List[str]) -> str:
+    """Locate a directory holding compile_commands.json, or '' if none."""
+    for root in roots:
+        base = root if os.path.isdir(root) else (os.path.dirname(root) or '.')
+        for d in (base, os.path.join(base, 'build')):
+            if os.path.isfile(os.path.join(d, 'compile_commands.json')):
+                return d
+    return ''
+
 def check_clang_tidy(files: List[str]) -> Tuple[int, int]:
     """Check code with clang-tidy"""
     print_section("clang-tidy")
@@ -153,13 +375,42 @@ def check_clang_tidy(files: List[str]) -> Tuple[int, int]:
         print_skip()
         return 0, 1
 
+    # With a compile database, -p supplies per-TU flags directly; parallel
+    # workers also share one persistent module cache so common headers are
+    # not re-parsed for every TU.
+    build_dir = _find_compile_db(ROOTS)
+    tidy_env = None
+    if build_dir:
+        module_cache = os.path.join(
+            os.path.expanduser('~'), '.cache', 'cquality', 'modules')
+        os.makedirs(module_cache, exist_ok=True)
+        # A copied env for the clang-tidy children only: mutating
+        # os.environ here would race with the other checks spawning
+        # concurrently from it.
+        tidy_env = {**os.environ}
+        tidy_env.setdefault('CLANG_MODULE_CACHE_PATH', module_cache)
+        flags = ['-p', build_dir]
+    else:
+        flags = ['--'] + EXTRA_FLAGS if EXTRA_FLAGS else []
+
+    _, files = partition_cached('clang-tidy', files)
+
+    results = EXECUTOR.map(
+        lambda c: (c, *run(['clang-tidy'] + c + flags, env=tidy_env)),
+        _chunks(files))
     msgs = []
-    flags = ['--'] + EXTRA_FLAGS if EXTRA_FLAGS else []
+    for chunk, rc, out in results:
+        if rc == 0 and not out.strip():
+            continue
+        grouped = _group_by_file(out, chunk)
+        if grouped:
+            msgs.extend((f, '\n'.join(grouped[f]).strip())
+                        for f in chunk if f in grouped)
+        else:
+            msgs.append((chunk[0], out.strip()))
 
-    for f in files:
-        rc, out = run(['clang-tidy', f] + flags)
-        if rc != 0 or out.strip():
-            msgs.append((f, out.strip()))
+    bad = {f for f, _ in msgs}
+    record_passed('clang-tidy', [f for f in files if f not in bad])
 
     if msgs:
         print_error(len(msgs))
@@ -183,12 +434,31 @@ def check_cppcheck(roots: List[str]) -> Tuple[int, int]:
         print_skip()
         return 0, 1
 
-    cmd = ['cppcheck', '--enable=all', '--quiet'] + roots
-    rc, out = run(cmd)
-
-    if rc != 0:
-        print_error(1)
-        print_file_issue("cppcheck", out.strip())
+    # One diagnostic per line so output can be streamed and counted
+    # without buffering cppcheck's full report in memory.
+    cmd = ['cppcheck', '--enable=all', '--quiet',
+           '--template={file}:{line}: {severity}: {message}'] + roots
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                         stderr=subprocess.STDOUT, text=True, bufsize=1,
+                         **_SPAWN_KWARGS)
+    issues = 0
+    buffered: List[str] = []
+    buffered_chars = 0
+    max_buffer = 64 * 1024  # keep at most this much for printing
+    for line in p.stdout:
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        issues += 1
+        if buffered_chars < max_buffer:
+            buffered.append(line)
+            buffered_chars += len(line)
+    p.stdout.close()
+    rc = p.wait()
+
+    if issues or rc != 0:
+        print_error(issues if issues else 1)
+        print_file_issue("cppcheck", "\n".join(buffered))
         return 1, 0
 
     print_success()
@@ -202,16 +472,36 @@ def check_cpplint(files: List[str]) -> Tuple[int, int]:
         print_skip()
         return 0, 1
 
+    _, files = partition_cached('cpplint', files)
+
+    if not files:
+        print_success()
+        return 0, 0
+
+    # cpplint takes arbitrarily many paths per invocation, so one chunk
+    # per core is enough: a single fork/exec per worker, full pool overlap.
+    size = -(-len(files) // min(len(files), os.cpu_count() or 1))
+    results = EXECUTOR.map(
+        lambda c: (c, *run(['cpplint', '--filter=-build/include_subdir, -legal/copyright'] + c)),
+        _chunks(files, size))
     msgs = []
-    for f in files:
-        rc, out = run(['cpplint', '--filter=-build/include_subdir, -legal/copyright', f])
+    for chunk, rc, out in results:
         filtered_lines = [
             line for line in out.splitlines()
             if line.strip() and not line.strip().startswith('Done processing')
         ]
         filtered = "\n".join(filtered_lines).strip()
-        if rc != 0 or filtered:
-            msgs.append((f, filtered if filtered else out.strip()))
+        if not filtered and rc == 0:
+            continue
+        grouped = _group_by_file(filtered, chunk)
+        if grouped:
+            msgs.extend((f, '\n'.join(grouped[f]).strip())
+                        for f in chunk if f in grouped)
+        else:
+            msgs.append((chunk[0], filtered if filtered else out.strip()))
+
+    bad = {f for f, _ in msgs}
+    record_passed('cpplint', [f for f in files if f not in bad])
 
     if msgs:
         print_error(len(msgs))
@@ -222,15 +512,35 @@ def check_cpplint(files: List[str]) -> Tuple[int, int]:
     print_success()
     return 0, 0
 
+def _prefetch(paths: List[str]):
+    """Hint the kernel to read the files ahead of the tool invocations.
+
+    POSIX_FADV_WILLNEED starts asynchronous readahead, so cold-cache and
+    network-backed files are already paged in when the tools open them."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for p in paths:
+        try:
+            fd = os.open(p, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
 def main():
+    CACHE.update(load_cache())
+
     # Find source files
     files = find_sources(ROOTS)
+    EXECUTOR.submit(_prefetch, files)
 
     if not files:
         print(f"\n{ICON_ERROR} {Colors.RED}No C/C++ source files found{Colors.RESET}\n")
         return 1
 
-    print_header()
+    print_header(len(files))
 
     # Run all checks
     checks = [
@@ -244,20 +554,37 @@ def main():
     passed = 0
     skipped = 0
 
-    for check_func, check_arg in checks:
-        rc, skip = check_func(check_arg)
-        if skip:
-            skipped += 1
-        elif rc == 0:
-            passed += 1
-        else:
-            failed += 1
+    def _run_check(check_func, check_arg):
+        _local.buf = []
+        try:
+            result = check_func(check_arg)
+        finally:
+            out, _local.buf = ''.join(_local.buf), None
+        return result, out
+
+    # All four tools run concurrently on a dedicated pool (separate from
+    # EXECUTOR, whose workers they consume internally); buffered output is
+    # flushed in the fixed tool order, so a slow clang-tidy on one file
+    # overlaps with cppcheck/cpplint on everything else.
+    with ThreadPoolExecutor(max_workers=len(checks)) as check_pool:
+        futures = [check_pool.submit(_run_check, fn, arg) for fn, arg in checks]
+        for fut in futures:
+            (rc, skip), out = fut.result()
+            sys.stdout.write(out)
+            if skip:
+                skipped += 1
+            elif rc == 0:
+                passed += 1
+            else:
+                failed += 1
 
     # Print summary
     print()
     total = len(checks)
     print_summary(total, passed, failed, skipped)
 
+    save_cache(CACHE)
+
     return 1 if failed > 0 else 0
 
 if __name__ == "__main__":
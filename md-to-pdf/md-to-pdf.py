@@ -22,21 +22,29 @@ Quick-start::
 """
 
 import argparse
-import base64
+import functools
+import gzip
 import hashlib
+import io
+import json
 import os
 import re
 import sys
+import tempfile
+import threading
 import time
-import zlib
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from html import escape
 from pathlib import Path
 from typing import Any
 
 import markdown
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from weasyprint import HTML
+from weasyprint.text.fonts import FontConfiguration
 
 KROKI_URL = "https://kroki.io"
 CACHE_DIR = Path(__file__).parent / ".mermaid-cache"
@@ -45,8 +53,68 @@ COVERS_DIR = Path(__file__).parent / "covers"
 DEFAULT_COVER = "noir"
 TIMEOUT = 60
 DELAY = 1.2
+MAX_RENDER_WORKERS = 8  # concurrent Kroki requests (kept low for rate limits)
+
+# Diagram renders are independent network calls, so they all go through a
+# shared pool instead of blocking one another.
+_RENDER_POOL = ThreadPoolExecutor(max_workers=MAX_RENDER_WORKERS)
+
+# Keep-alive session: one TLS handshake for the whole run instead of one
+# per diagram.  urllib3 Retry replaces the hand-rolled retry/sleep loops
+# and transparently handles Kroki's occasional 5xx gateway hiccups.
+# One font configuration for the process: WeasyPrint otherwise redoes
+# the fontconfig scan on every write_pdf, which dominates cold start and
+# repeats per document in batch runs.
+FONT_CONFIG = FontConfiguration()
+
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=MAX_RENDER_WORKERS,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=DELAY,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=("GET", "POST"),
+        ),
+    ),
+)
 
 _MD_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_MERMAID_RE = re.compile(r"```mermaid\s*\n([\s\S]*?)```")
+# Codepoint ranges stripped from Mermaid sources before hitting Kroki;
+# turned into a str.translate deletion table on first use.
+_EMOJI_RANGES = (
+    (0x1F300, 0x1FAFF),
+    (0x2702, 0x27B0),
+    (0x24C2, 0x1F251),
+    (0x2600, 0x27BF),
+)
+_emoji_table: dict[int, None] | None = None
+_LIST_BULLET_RE = re.compile(r"^\s*[-*]\s|^\s*\d+\.\s")
+_HEADING_RE = re.compile(r"^(#{1,3})\s+(.+?)\s*$", re.M)
+_ATTR_ID_RE = re.compile(r"\{#[^}]+\}$")
+# strip_md_markup / slugify run per heading; keeping their patterns
+# pre-compiled skips the re-cache probe on every short-string call.
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"\*(.+?)\*")
+_CODE_SPAN_RE = re.compile(r"`(.+?)`")
+_TAG_RE = re.compile(r"<[^>]+>")
+_ENT_RE = re.compile(r"&[a-zA-Z]+;")
+_WS_RE = re.compile(r"[\s_]+")
+_NONWORD_RE = re.compile(r"[^\w-]")
+_DASH_RE = re.compile(r"-+")
+_SUBTITLE_RE = re.compile(r"\s*\n\*([^*\n]+)\*\s*$", re.M)
+_TOC_TITLE_RE = re.compile(r"table of contents|table des matières", re.I)
+# Hand-written TOC sections (either language) are dropped in favour of
+# the generated one; a single alternation strips both in one scan.
+_MANUAL_TOC_RE = re.compile(
+    r"^## (?:Table of Contents|Table des matières)\s*\n"
+    r"[\s\S]*?(?=\n## |\n---|\Z)",
+    re.M,
+)
 
 MARKDOWN_EXTENSIONS = ["tables", "fenced_code", "codehilite", "sane_lists", "smarty", "attr_list"]
 MARKDOWN_EXTENSION_CONFIGS: dict[str, dict[str, Any]] = {
@@ -92,6 +160,95 @@ def _colorize_brackets(html: str) -> str:
     return _BRACKET_RE.sub(_repl, html)
 
 
+# Markdown engine selected via --md-engine; "markdown" is the default,
+# "mistune" trades the extension set for a much faster single-pass parser
+# and "pyromark" parses in native code (Rust pulldown-cmark bindings).
+_MD_ENGINE = "markdown"
+_MISTUNE = None
+# Document-wide duplicate counter for the mistune renderer's heading
+# ids, cleared per conversion — mirrors the slug_counts map used by
+# inject_heading_ids so all engines suffix repeats the same way.
+_MISTUNE_SLUG_COUNTS: defaultdict[str, int] = defaultdict(int)
+
+# Option flags handed to pyromark, built on first use (the module is
+# imported lazily); ENABLE_HEADING_ATTRIBUTES honours the same {#slug}
+# markers that attr_list consumes, so TOC anchors keep working.
+_PYROMARK_OPTIONS = None
+
+
+def _render_markdown_pyromark(text: str) -> str:
+    """Render Markdown through pyromark (Rust pulldown-cmark).
+
+    The parse loop runs in native code and releases the GIL, which is
+    orders of magnitude faster than Python-Markdown on multi-thousand-
+    line documents.  Output is plain CommonMark HTML: no Pygments
+    classes on code blocks, so syntax highlighting falls back to the
+    theme's monochrome ``pre`` styling.
+    """
+    global _PYROMARK_OPTIONS
+    import pyromark
+
+    if _PYROMARK_OPTIONS is None:
+        opts = pyromark.Options
+        _PYROMARK_OPTIONS = (
+            opts.ENABLE_TABLES
+            | opts.ENABLE_FOOTNOTES
+            | opts.ENABLE_STRIKETHROUGH
+            | opts.ENABLE_TASKLISTS
+            | opts.ENABLE_SMART_PUNCTUATION
+            | opts.ENABLE_HEADING_ATTRIBUTES
+        )
+    return _colorize_brackets(
+        pyromark.html(text, options=_PYROMARK_OPTIONS)
+    )
+
+
+def _render_markdown_mistune(text: str) -> str:
+    """Render Markdown through mistune's single-pass lexer.
+
+    mistune 3.x is several times faster than Python-Markdown on large
+    documents.  A custom renderer keeps the output compatible with the
+    theme: code blocks go through Pygments with the same ``codehilite``
+    wrapper class, and headings get ``id`` slugs inline so the TOC
+    anchors resolve without a post-pass.
+    """
+    global _MISTUNE
+    if _MISTUNE is None:
+        import mistune
+        from pygments import highlight
+        from pygments.formatters import HtmlFormatter
+        from pygments.lexers import get_lexer_by_name
+        from pygments.util import ClassNotFound
+
+        class _ThemeRenderer(mistune.HTMLRenderer):
+            def heading(self, text, level, **attrs):
+                base = slugify(_TAG_RE.sub("", text))
+                if not base:
+                    return f"<h{level}>{text}</h{level}>\n"
+                count = _MISTUNE_SLUG_COUNTS[base]
+                _MISTUNE_SLUG_COUNTS[base] += 1
+                final = base if count == 0 else f"{base}-{count}"
+                return f'<h{level} id="{final}">{text}</h{level}>\n'
+
+            def block_code(self, code, info=None):
+                if info:
+                    try:
+                        lexer = get_lexer_by_name(info.strip().split(None, 1)[0])
+                        return highlight(
+                            code, lexer, HtmlFormatter(cssclass="codehilite")
+                        )
+                    except ClassNotFound:
+                        pass
+                esc = escape(code, quote=False)
+                return f'<div class="codehilite"><pre><code>{esc}</code></pre></div>\n'
+
+        _MISTUNE = mistune.create_markdown(
+            renderer=_ThemeRenderer(escape=False),
+            plugins=["table", "strikethrough", "task_lists", "footnotes"],
+        )
+    return _colorize_brackets(_MISTUNE(text))
+
+
 def render_markdown(text: str) -> str:
     """Render Markdown using the shared extension set.
 
@@ -102,7 +259,14 @@ def render_markdown(text: str) -> str:
     A bracket post-processor then splits the generic ``.p`` class into
     ``.p-brace`` / ``.p-bracket`` / ``.p-paren`` so each bracket family can
     receive its own color token.
+
+    With ``--md-engine mistune`` the text goes through
+    :func:`_render_markdown_mistune` instead.
     """
+    if _MD_ENGINE == "mistune":
+        return _render_markdown_mistune(text)
+    if _MD_ENGINE == "pyromark":
+        return _render_markdown_pyromark(text)
     html = markdown.markdown(
         text,
         extensions=MARKDOWN_EXTENSIONS,
@@ -112,6 +276,78 @@ def render_markdown(text: str) -> str:
     return _colorize_brackets(html)
 
 
+# Rendered-HTML cache keyed by section content hash; only touched
+# sections re-render across repeated builds in the same process.
+_SECTION_HTML_CACHE: dict[bytes, str] = {}
+
+# Matches either a fence toggle or a section heading at line start; the
+# splitter walks these in order so it can tell the two apart.
+_SECTION_EVENT_RE = re.compile(r"^(?:```|## )", re.M)
+
+
+def _split_sections(md_text: str) -> list[str]:
+    """Split Markdown on top-level ``## `` lines, fence-aware.
+
+    A naive ``re.split`` on ``^## `` also cuts at column-zero ``## ``
+    lines inside fenced code blocks (shell comments, Markdown examples),
+    leaving one section with an unterminated fence and promoting the
+    comment to a real heading in the next.  This walks fence toggles and
+    heading candidates in one pass and only splits outside fences; the
+    parts always concatenate back to the original text.
+
+    :param md_text: Full preprocessed Markdown source.
+    :returns: List of section strings (never empty).
+    """
+    bounds: list[int] = []
+    in_fence = False
+    for m in _SECTION_EVENT_RE.finditer(md_text):
+        if m.group(0) == "```":
+            in_fence = not in_fence
+        elif not in_fence and m.start() != 0:
+            bounds.append(m.start())
+    parts = []
+    prev = 0
+    for b in bounds:
+        parts.append(md_text[prev:b])
+        prev = b
+    parts.append(md_text[prev:])
+    return parts
+
+
+def render_markdown_cached(md_text: str) -> str:
+    """Render Markdown section-by-section with a content-keyed cache.
+
+    The text is split on top-level ``## `` boundaries (ignoring fenced
+    code blocks, see :func:`_split_sections`) and each section's HTML is
+    cached by a hash of (engine, source).  On incremental edits only the
+    touched section pays the parser cost; unchanged sections come
+    straight from the cache.  Sections render independently, which
+    matches this pipeline (callouts and diagrams are already resolved
+    before the Markdown engine runs).
+
+    :param md_text: Full preprocessed Markdown source.
+    :returns: Concatenated HTML of all sections.
+    """
+    if _MD_ENGINE == "mistune":
+        # The mistune renderer dedupes heading ids document-wide, so its
+        # output depends on position, not just section content — caching
+        # per section would replay stale ids.
+        return render_markdown(md_text)
+    out: list[str] = []
+    for part in _split_sections(md_text):
+        if not part:
+            continue
+        key = hashlib.blake2b(
+            (_MD_ENGINE + "|" + part).encode(), digest_size=12
+        ).digest()
+        html = _SECTION_HTML_CACHE.get(key)
+        if html is None:
+            html = render_markdown(part)
+            _SECTION_HTML_CACHE[key] = html
+        out.append(html)
+    return "".join(out)
+
+
 def strip_md_markup(text: str) -> str:
     """Strip Markdown link syntax and inline formatting from a heading.
 
@@ -122,64 +358,90 @@ def strip_md_markup(text: str) -> str:
     :returns: Plain text with all inline Markdown removed.
     """
     text = _MD_LINK_RE.sub(r"\1", text)
-    text = re.sub(r"\*\*(.+?)\*\*", r"\1", text)
-    text = re.sub(r"\*(.+?)\*", r"\1", text)
-    text = re.sub(r"`(.+?)`", r"\1", text)
+    text = _BOLD_RE.sub(r"\1", text)
+    text = _ITALIC_RE.sub(r"\1", text)
+    text = _CODE_SPAN_RE.sub(r"\1", text)
     return text.strip()
 
 
+@functools.lru_cache(maxsize=None)
 def slugify(text: str) -> str:
     """Convert a Markdown heading into a URL-safe slug.
 
     The result is used as the ``id`` attribute on HTML headings and as the
     ``href`` anchor in the table-of-contents.  Both call-sites feed raw
-    Markdown text so the slugs always match.
+    Markdown text so the slugs always match — and thanks to the memo the
+    regex cascade runs once per distinct heading, not once per call-site.
 
     :param text: Raw Markdown heading text.
     :returns: Lowercase, hyphen-separated slug string.
     """
     s = strip_md_markup(text)
-    s = re.sub(r"<[^>]+>", "", s)
+    # Most headings carry no HTML, entities or typographic dashes; a few
+    # cheap membership checks let them skip three of the six passes.
+    if "<" not in s and "&" not in s and "\u2014" not in s and "\u2013" not in s:
+        s = _WS_RE.sub("-", s.lower())
+        s = _NONWORD_RE.sub("", s)
+        s = _DASH_RE.sub("-", s)
+        return s.strip("-")
+    s = _TAG_RE.sub("", s)
     s = s.replace("\u2014", "-").replace("\u2013", "-")
-    s = re.sub(r"&[a-zA-Z]+;", "", s)
+    s = _ENT_RE.sub("", s)
     s = s.lower()
-    s = re.sub(r"[\s_]+", "-", s)
-    s = re.sub(r"[^\w-]", "", s)
-    s = re.sub(r"-+", "-", s)
+    s = _WS_RE.sub("-", s)
+    s = _NONWORD_RE.sub("", s)
+    s = _DASH_RE.sub("-", s)
     return s.strip("-")
 
 
-def build_toc(md_text: str) -> str:
-    """Build an HTML table-of-contents from raw Markdown.
+def scan_metadata(md_text: str) -> tuple[str | None, str, list[tuple[int, str, str]]]:
+    """Extract title, subtitle and TOC headings in one regex pass.
 
-    Scans every line for ``##`` and ``###`` headings, skipping any that read
-    "Table of Contents" or "Table des matières".  Nested ``<ol>`` elements
-    give the TOC a two-level hierarchy.
+    The first ``#`` heading is the document title; an italic line
+    directly below it is the subtitle.  ``##`` and ``###`` headings
+    become TOC entries, skipping any that read "Table of Contents" or
+    "Table des matières".  One :data:`_HEADING_RE` sweep replaces the
+    three separate scans the build used to make over the same text.
 
     :param md_text: Full Markdown source (before HTML conversion).
-    :returns: HTML string of the ``<nav class="toc">`` block, or ``""``
-              if no headings are found.
+    :returns: ``(title, subtitle, items)`` — title may be ``None``,
+              subtitle may be ``""``, items are ``(level, text, slug)``
+              tuples ready for :func:`build_toc`.
     """
+    title: str | None = None
+    subtitle = ""
     items: list[tuple[int, str, str]] = []
 
-    for line in md_text.splitlines():
-        m2 = re.match(r"^##\s+(.+?)\s*$", line)
-        m3 = re.match(r"^###\s+(.+?)\s*$", line)
-        if m2:
-            t = m2.group(1)
-            if re.search(r"table of contents|table des matières", t, re.I):
-                continue
-            clean = strip_md_markup(t)
-            if not clean:
-                continue
-            items.append((2, clean, slugify(t)))
-        elif m3:
-            t = m3.group(1)
-            clean = strip_md_markup(t)
-            if not clean:
-                continue
-            items.append((3, clean, slugify(t)))
+    for m in _HEADING_RE.finditer(md_text):
+        level = len(m.group(1))
+        t = m.group(2)
+        if level == 1:
+            if title is None:
+                title = t.strip()
+                sub = _SUBTITLE_RE.match(md_text, m.end())
+                if sub:
+                    subtitle = sub.group(1).strip()
+            continue
+        if level == 2 and _TOC_TITLE_RE.search(t):
+            continue
+        clean = strip_md_markup(t)
+        if not clean:
+            continue
+        items.append((level, clean, slugify(t)))
+
+    return title, subtitle, items
+
 
+def build_toc(items: list[tuple[int, str, str]]) -> str:
+    """Build an HTML table-of-contents from scanned heading items.
+
+    Nested ``<ol>`` elements give the TOC a two-level hierarchy.
+
+    :param items: ``(level, text, slug)`` tuples from
+                  :func:`scan_metadata`.
+    :returns: HTML string of the ``<nav class="toc">`` block, or ``""``
+              if no headings are found.
+    """
     if not items:
         return ""
 
@@ -191,19 +453,16 @@ def build_toc(md_text: str) -> str:
     in_sub = False
 
     for level, title, slug in items:
-        safe_title = (
-            title.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        )
+        safe_title = escape(title, quote=False)
         if level == 2:
             if in_sub:
-                lines.append("      </ol>")
-                lines.append("    </li>")
+                lines.extend(("      </ol>", "    </li>"))
                 in_sub = False
-            lines.append('  <li class="toc-h2">')
-            lines.append(
+            lines.extend((
+                '  <li class="toc-h2">',
                 f'    <a href="#{slug}">'
-                f'<span class="toc-num"></span>{safe_title}</a>'
-            )
+                f'<span class="toc-num"></span>{safe_title}</a>',
+            ))
         else:
             if not in_sub:
                 lines.append('    <ol class="toc-sub">')
@@ -222,143 +481,431 @@ def build_toc(md_text: str) -> str:
     return "\n".join(lines) + "\n"
 
 
-def add_heading_ids(html: str) -> str:
-    """Inject ``id`` attributes into ``<h1>``–``<h3>`` elements.
+def inject_heading_ids(md_text: str, slug_counts: dict | None = None) -> str:
+    """Append ``{#slug}`` attr_list ids to ``#``–``###`` heading lines.
 
-    Uses the same :func:`slugify` logic as :func:`build_toc` so that TOC
-    anchor links resolve correctly.  Duplicate slugs receive a numeric
-    suffix (e.g. ``foo-1``).
+    The ``attr_list`` extension turns these into ``id`` attributes during
+    rendering, so no post-hoc regex pass over the generated HTML is
+    needed; the slugs come from the same :func:`slugify` as
+    :func:`build_toc`, so anchors agree by construction.  Duplicate slugs
+    receive a numeric suffix (e.g. ``foo-1``).  Lines inside fenced code
+    blocks are left untouched.
 
-    :param html: Body HTML produced by the Markdown engine.
-    :returns: The same HTML with ``id="…"`` added to each heading.
+    :param md_text:     Markdown source (after manual-TOC stripping).
+    :param slug_counts: Shared duplicate counter, so front matter and
+                        body can be processed as one document.
+    :returns: Markdown with id attributes appended to each heading.
     """
-    slug_counts: dict[str, int] = defaultdict(int)
+    if slug_counts is None:
+        slug_counts = defaultdict(int)
 
-    def _repl(m: re.Match) -> str:
-        tag = m.group(1)
-        attrs = m.group(2)
-        inner = m.group(3)
-
-        if "id=" in (attrs or ""):
-            return m.group(0)
-
-        plain = re.sub(r"<[^>]+>", "", inner)
-        base_slug = slugify(plain)
-
-        count = slug_counts[base_slug]
-        slug_counts[base_slug] += 1
-        final = base_slug if count == 0 else f"{base_slug}-{count}"
-
-        new_attrs = f' id="{final}"'
-        if attrs and attrs.strip():
-            new_attrs += f" {attrs.strip()}"
-        return f"<{tag}{new_attrs}>{inner}</{tag}>"
-
-    return re.sub(
-        r"<(h[1-3])([ \t][^>]*)?>(.+?)</\1>",
-        _repl,
-        html,
-        flags=re.DOTALL,
-    )
+    lines = md_text.split("\n")
+    result: list[str] = []
+    in_fence = False
+
+    for line in lines:
+        s = line.rstrip()
+        if s.startswith("```"):
+            in_fence = not in_fence
+        elif not in_fence and s.startswith("#"):
+            m = _HEADING_RE.match(s)
+            if m and not _ATTR_ID_RE.search(m.group(2)):
+                base = slugify(m.group(2))
+                if base:
+                    count = slug_counts[base]
+                    slug_counts[base] += 1
+                    final = base if count == 0 else f"{base}-{count}"
+                    line = f"{m.group(1)} {m.group(2)} {{#{final}}}"
+        result.append(line)
+
+    return "\n".join(result)
 
 
 def _strip_emoji(text: str) -> str:
     """Remove emoji and symbol characters from Mermaid diagram source.
 
     Kroki's renderer sometimes chokes on emoji codepoints, so they are
-    stripped before the diagram is sent to the API.
+    stripped before the diagram is sent to the API.  Deletion runs
+    through ``str.translate`` — a single C-level table lookup per
+    character, far cheaper than a character-class regex over wide
+    codepoint ranges.  The table is built lazily on first use.
 
     :param text: Raw Mermaid diagram source.
     :returns: Cleaned diagram source without emoji.
     """
-    return re.compile(
-        r"[\U0001F300-\U0001FAFF\U00002702-\U000027B0\U000024C2-\U0001F251"
-        r"\u2600-\u27BF\uFE0F\u200D]+",
-        re.UNICODE,
-    ).sub("", text)
+    global _emoji_table
+    if _emoji_table is None:
+        table: dict[int, None] = {}
+        for lo, hi in _EMOJI_RANGES:
+            for cp in range(lo, hi + 1):
+                table[cp] = None
+        table[0x200D] = None  # zero-width joiner
+        table[0xFE0F] = None  # variation selector-16
+        _emoji_table = table
+    return text.translate(_emoji_table)
 
 
-def render_mermaid(code: str, no_cache: bool = False) -> str | None:
-    """Render a Mermaid diagram to a base-64 encoded PNG via Kroki.io.
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# Bump when Kroki changes output in a way worth invalidating caches for;
+# used only when the live version probe fails.
+KROKI_VERSION_FALLBACK = "unknown"
+
+_kroki_version_cached: str | None = None
+_INDEX_LOCK = threading.Lock()
+
+# Process-local memo: hash → rendered result.  Recurring diagram fragments
+# within (or across) documents resolve from RAM instead of stat + read +
+# re-encode per occurrence.
+_DIAGRAM_MEMO: dict[str, str] = {}
+
+# In-flight renders keyed by diagram source, shared between the early
+# prefetch pass and replace_mermaid_blocks.
+_RENDER_FUTURES: dict[str, Any] = {}
+
+
+def _submit_render(code: str, no_cache: bool = False):
+    """Submit a diagram render to the pool, deduplicating by source.
+
+    :param code:     Cleaned Mermaid diagram source.
+    :param no_cache: Forward to :func:`render_mermaid`.
+    :returns: The (possibly shared) :class:`~concurrent.futures.Future`.
+    """
+    fut = _RENDER_FUTURES.get(code)
+    if fut is None:
+        fut = _RENDER_POOL.submit(render_mermaid, code, no_cache)
+        _RENDER_FUTURES[code] = fut
+    return fut
+
+
+def prefetch_mermaid(md_text: str, no_cache: bool = False) -> int:
+    """Kick off renders for every fenced Mermaid block in *md_text*.
+
+    Called right after the source file is read, so network round-trips
+    overlap with the CPU-bound TOC build and Markdown preprocessing that
+    run before the diagrams are actually spliced in.
+
+    :param md_text:  Full Markdown source.
+    :param no_cache: Forward to :func:`render_mermaid`.
+    :returns: Number of Mermaid blocks found.
+    """
+    if no_cache:
+        _RENDER_FUTURES.clear()
+    n = 0
+    for m in _MERMAID_RE.finditer(md_text):
+        _submit_render(_strip_emoji(m.group(1).strip()), no_cache)
+        n += 1
+    return n
+
+
+def _kroki_version() -> str:
+    """Probe the Kroki server version once, for cache keying.
+
+    A Mermaid upgrade on the server changes rendered output, so the
+    version participates in the cache key.  Failures fall back to a
+    constant so offline runs still hit the cache consistently.
+
+    :returns: Version string from the ``X-Kroki-Version`` header, or the
+              in-repo fallback constant.
+    """
+    global _kroki_version_cached
+    if _kroki_version_cached is None:
+        try:
+            r = SESSION.get(KROKI_URL, timeout=5)
+            _kroki_version_cached = r.headers.get(
+                "X-Kroki-Version", KROKI_VERSION_FALLBACK
+            )
+        except Exception:
+            _kroki_version_cached = KROKI_VERSION_FALLBACK
+    return _kroki_version_cached
+
+
+def _update_cache_index(key: str, size: int, code: str) -> None:
+    """Record a cache entry in ``.mermaid-cache/index.json``.
+
+    The index maps hash → (size, mtime, source preview) so cache
+    inspection and pruning never require re-reading the images.  Written
+    atomically via ``os.replace``.
+
+    :param key:  Cache key (hash) of the entry.
+    :param size: Size in bytes of the cached image.
+    :param code: Diagram source (only a preview is stored).
+    """
+    index_path = CACHE_DIR / "index.json"
+    with _INDEX_LOCK:
+        try:
+            index = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+        index[key] = {
+            "size": size,
+            "mtime": time.time(),
+            "preview": code[:80],
+        }
+        tmp = index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(index, indent=1), encoding="utf-8")
+        os.replace(tmp, index_path)
+
+
+def _optimize_png(png: bytes) -> bytes:
+    """Palette-quantize a truecolor PNG when Pillow is available.
+
+    Kroki returns unoptimized truecolor PNGs; typical diagrams use far
+    fewer than 256 colors, so an adaptive palette cuts the bytes carried
+    through the cache and into the PDF by 3-8×.  Without Pillow, or if
+    quantization does not actually shrink the image, the original bytes
+    are returned unchanged.
+
+    :param png: Raw PNG bytes from Kroki.
+    :returns: Optimized (or original) PNG bytes.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return png
+    try:
+        img = Image.open(io.BytesIO(png))
+        if img.mode in ("RGB", "RGBA"):
+            img = img.convert("P", palette=Image.ADAPTIVE, colors=256)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True, compress_level=9)
+        out = buf.getvalue()
+        return out if len(out) < len(png) else png
+    except Exception as e:
+        print(f"   ⚠  PNG optimize skipped: {e}")
+        return png
+
+
+def _persist_svg(path: Path, svg: str, key: str, code: str) -> None:
+    """Write a freshly rendered SVG diagram to the cache.
+
+    Runs on the render pool so the build never waits on the write.
+
+    :param path: Target ``{key}.svg`` path.
+    :param svg:  Inline-ready SVG markup.
+    :param key:  Cache key, for the index entry.
+    :param code: Diagram source, for the index preview.
+    """
+    try:
+        path.write_text(svg, encoding="utf-8")
+        _update_cache_index(key, len(svg), code)
+    except OSError as e:
+        print(f"   ⚠  Cache write failed: {e}")
+
+
+# Default diagram format.  SVG is vector-sharp, a few KB of text, and
+# needs no base64 round-trip; --raster switches back to cached PNGs.
+_DIAGRAM_FMT = "svg"
+
+
+def _looks_valid(content: bytes, fmt: str) -> bool:
+    """Sanity-check a Kroki response body for the requested format.
+
+    Rejects HTML error pages (e.g. 504 gateway bodies) that would
+    otherwise be cached as images.
+
+    :param content: Raw response bytes.
+    :param fmt:     ``"svg"`` or ``"png"``.
+    :returns: Whether the payload plausibly is the requested format.
+    """
+    if fmt == "png":
+        return content[:8] == PNG_MAGIC
+    return b"<svg" in content[:500]
+
+
+# How long a failed render is remembered before Kroki is retried.  A
+# fixed code change produces a new cache key, so the sentinel only ever
+# suppresses retries of the *same* broken diagram.
+FAIL_TTL = 3600
+
+
+def _recently_failed(key: str) -> bool:
+    """Check (and expire) the negative-cache sentinel for a cache key.
+
+    :param key: Diagram cache key.
+    :returns: ``True`` if the same diagram failed less than
+              :data:`FAIL_TTL` seconds ago.
+    """
+    sentinel = CACHE_DIR / f"{key}.fail"
+    try:
+        if time.time() - sentinel.stat().st_mtime < FAIL_TTL:
+            return True
+        sentinel.unlink()
+    except OSError:
+        pass
+    return False
+
+
+def _mark_failed(key: str) -> None:
+    """Drop a negative-cache sentinel so the next run skips the retries.
+
+    :param key: Diagram cache key.
+    """
+    try:
+        (CACHE_DIR / f"{key}.fail").write_text(str(time.time()))
+    except OSError:
+        pass
+
+
+def _fetch_kroki(code: str, fmt: str) -> bytes | None:
+    """Fetch one rendered diagram from Kroki.
+
+    Sends a single POST with a gzip-compressed plain-text body, which
+    Kroki accepts for diagrams of any size — no URL-length ceiling, no
+    base64 inflation, no JSON wrapper.  Retries and backoff are handled
+    by the session adapter.
+
+    :param code: Mermaid diagram source code.
+    :param fmt:  Output format, ``"svg"`` or ``"png"``.
+    :returns: Response bytes, or ``None`` on total failure.
+    """
+    print(f"   🎨  Rendering via Kroki ({len(code)} chars)…")
+
+    try:
+        # level 6 — level 9 costs extra CPU for <1% gain on
+        # diagram-sized inputs
+        r = SESSION.post(
+            f"{KROKI_URL}/mermaid/{fmt}",
+            data=gzip.compress(code.encode("utf-8"), compresslevel=6),
+            headers={
+                "Content-Type": "text/plain",
+                "Content-Encoding": "gzip",
+            },
+            timeout=TIMEOUT,
+        )
+        r.raise_for_status()
+        if not _looks_valid(r.content, fmt):
+            raise ValueError(f"response is not a {fmt.upper()}")
+        print(f"   ✓  {len(r.content) // 1024} KB")
+        return r.content
+    except Exception as e:
+        print(f"   ⚠  POST: {e}")
+    return None
 
-    Tries a compact GET request first (for diagrams <= 2000 chars), then
-    falls back to POST.  Results are cached on disk by content hash so
+
+def render_mermaid(code: str, no_cache: bool = False) -> str | None:
+    """Render a Mermaid diagram via Kroki.io.
+
+    In the default SVG mode the returned string is inline-ready markup
+    (XML prolog and doctype stripped) that WeasyPrint vector-renders
+    natively — no base64, no rasterization.  With ``--raster`` the
+    return value is a ``file://`` URI pointing at the cached PNG, which
+    WeasyPrint resolves itself — the image bytes never transit through
+    the HTML string.  Results are cached on disk by content hash so
     unchanged diagrams are never re-rendered.
 
     :param code:     Mermaid diagram source code.
     :param no_cache: When ``True``, ignore and overwrite cached images.
-    :returns: Base-64 string of the PNG, or ``None`` on total failure.
+    :returns: Inline SVG markup or ``file://`` PNG URI, or ``None`` on
+              failure.
     """
+    fmt = _DIAGRAM_FMT
     CACHE_DIR.mkdir(exist_ok=True)
-    key = hashlib.sha256(code.encode()).hexdigest()[:16]
-    path = CACHE_DIR / f"{key}.png"
-
-    if not no_cache and path.exists() and path.stat().st_size > 500:
-        print(f"   ♻  Cache: {key}")
-        return base64.b64encode(path.read_bytes()).decode()
+    # BLAKE2b: this is a cache key, not a security boundary, so the
+    # fastest stdlib hash wins.  The "b2-" prefix keeps old SHA-256
+    # entries from being misidentified.
+    key = "b2-" + hashlib.blake2b(
+        f"{code}|{_kroki_version()}|{fmt}".encode(), digest_size=12
+    ).hexdigest()
+
+    if fmt == "svg":
+        path = CACHE_DIR / f"{key}.svg"
+
+        if not no_cache:
+            if key in _DIAGRAM_MEMO:
+                return _DIAGRAM_MEMO[key]
+            if path.exists():
+                svg = path.read_text(encoding="utf-8")
+                if "<svg" in svg[:500]:
+                    print(f"   ♻  Cache: {key}")
+                    svg = svg[svg.find("<svg"):]
+                    _DIAGRAM_MEMO[key] = svg
+                    return svg
+
+        if not no_cache and _recently_failed(key):
+            print(f"   ⏭  Skipping render that failed <{FAIL_TTL}s ago")
+            return None
+
+        data = _fetch_kroki(code, "svg")
+        if data:
+            svg = data.decode("utf-8", errors="replace")
+            svg = svg[svg.find("<svg"):]
+            _DIAGRAM_MEMO[key] = svg
+            _RENDER_POOL.submit(_persist_svg, path, svg, key, code)
+            return svg
+
+        _mark_failed(key)
+        print("   ✗  All attempts failed — using code-block fallback")
+        return None
 
-    print(f"   🎨  Rendering via Kroki ({len(code)} chars)…")
-    png = None
+    path = CACHE_DIR / f"{key}.png"
 
-    if len(code) <= 2000:
-        for attempt in range(2):
-            try:
-                enc = base64.urlsafe_b64encode(
-                    zlib.compress(code.encode("utf-8"), 9)
-                ).decode()
-                r = requests.get(
-                    f"{KROKI_URL}/mermaid/png/{enc}", timeout=TIMEOUT
-                )
-                r.raise_for_status()
-                png = r.content
-                print(f"   ✓  {len(png) // 1024} KB (GET)")
-                break
-            except Exception as e:
-                print(f"   ⚠  GET {attempt + 1}: {e}")
-                time.sleep(DELAY)
+    if not no_cache:
+        if key in _DIAGRAM_MEMO:
+            return _DIAGRAM_MEMO[key]
+        if path.exists():
+            with path.open("rb") as f:
+                magic = f.read(8)
+            if magic == PNG_MAGIC:
+                print(f"   ♻  Cache: {key}")
+                uri = path.resolve().as_uri()
+                _DIAGRAM_MEMO[key] = uri
+                return uri
+
+    if not no_cache and _recently_failed(key):
+        print(f"   ⏭  Skipping render that failed <{FAIL_TTL}s ago")
+        return None
 
-    if not png:
-        for attempt in range(3):
-            try:
-                time.sleep(DELAY)
-                r = requests.post(
-                    f"{KROKI_URL}/mermaid/png",
-                    json={"diagram_source": code},
-                    headers={"Content-Type": "application/json"},
-                    timeout=TIMEOUT,
-                )
-                r.raise_for_status()
-                png = r.content
-                print(f"   ✓  {len(png) // 1024} KB (POST)")
-                break
-            except Exception as e:
-                print(f"   ⚠  POST {attempt + 1}: {e}")
-                time.sleep(DELAY * (attempt + 1))
+    png = _fetch_kroki(code, "png")
 
     if png:
-        path.write_bytes(png)
-        return base64.b64encode(png).decode()
-
+        png = _optimize_png(png)
+        # The image must be on disk before WeasyPrint resolves the
+        # file:// reference, so this write is synchronous; only the
+        # index bookkeeping is deferred to the pool.
+        try:
+            path.write_bytes(png)
+        except OSError as e:
+            print(f"   ⚠  Cache write failed: {e}")
+            return None
+        _RENDER_POOL.submit(_update_cache_index, key, len(png), code)
+        uri = path.resolve().as_uri()
+        _DIAGRAM_MEMO[key] = uri
+        return uri
+
+    _mark_failed(key)
     print("   ✗  All attempts failed — using code-block fallback")
     return None
 
 
 def replace_mermaid_blocks(md_text: str, no_cache: bool = False) -> str:
-    """Replace every fenced mermaid block with an inline PNG image.
+    """Replace every fenced mermaid block with a rendered diagram.
 
     Each fenced block is sent to :func:`render_mermaid`.  On success the
-    image is embedded as a data-URI; on failure a ``<pre>`` code-block
-    fallback is inserted instead.
+    SVG markup is embedded inline (or, with ``--raster``, an ``<img>``
+    referencing the cached PNG by ``file://`` URI); on failure a
+    ``<pre>`` code-block fallback is inserted.
+
+    All diagrams are dispatched to the shared render pool up front, so K
+    uncached diagrams cost roughly one round-trip instead of K.
 
     :param md_text:  Full Markdown source.
     :param no_cache: Forward to :func:`render_mermaid`.
     :returns: Markdown with Mermaid fences replaced by HTML ``<div>`` blocks.
     """
-    n = [0]
-
-    def _sub(m: re.Match) -> str:
-        n[0] += 1
-        code = _strip_emoji(m.group(1).strip())
+    matches = list(_MERMAID_RE.finditer(md_text))
+    if not matches:
+        return md_text
+
+    codes = [_strip_emoji(m.group(1).strip()) for m in matches]
+    # One future per distinct source: duplicate blocks share the result,
+    # and blocks already submitted by prefetch_mermaid are reused as-is.
+    futures = [_submit_render(code, no_cache) for code in codes]
+
+    out: list[str] = []
+    last = 0
+    for n, (m, code, fut) in enumerate(zip(matches, codes, futures), 1):
+        print(f"\n   [{n}] Diagram…")
+        rendered = fut.result()
         code_parts = code.split(None, 1)
         diagram_type = code_parts[0].lower() if code_parts else ""
         diagram_class = (
@@ -366,68 +913,75 @@ def replace_mermaid_blocks(md_text: str, no_cache: bool = False) -> str:
             if diagram_type == "journey"
             else "diagram"
         )
-        print(f"\n   [{n[0]}] Diagram…")
-        b64 = render_mermaid(code, no_cache)
-        if b64:
-            return (
-                f'\n<div class="{diagram_class}">'
-                f'<img src="data:image/png;base64,{b64}" '
-                f'alt="Diagram {n[0]}"/>'
-                f"</div>\n"
+        out.append(md_text[last:m.start()])
+        if rendered:
+            if _DIAGRAM_FMT == "svg":
+                out.append(
+                    f'\n<div class="{diagram_class}">{rendered}</div>\n'
+                )
+            else:
+                out.append(
+                    f'\n<div class="{diagram_class}">'
+                    f'<img src="{rendered}" alt="Diagram {n}"/>'
+                    f"</div>\n"
+                )
+        else:
+            esc = escape(code, quote=False)
+            out.append(
+                f'\n<div class="diagram-fallback">'
+                f"<pre><code>{esc}</code></pre></div>\n"
             )
-        esc = (
-            code.replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-        )
-        return (
-            f'\n<div class="diagram-fallback">'
-            f"<pre><code>{esc}</code></pre></div>\n"
-        )
+        last = m.end()
+    out.append(md_text[last:])
+    return "".join(out)
 
-    return re.compile(r"```mermaid\s*\n([\s\S]*?)```").sub(_sub, md_text)
 
+def preprocess_markdown(text: str) -> str:
+    """Apply blockquote hard-breaks and list separation in a single pass.
 
-def _in_fence(lines: list[str], i: int) -> bool:
-    """Return ``True`` if line *i* sits inside a fenced code block.
+    Fuses two per-line fixes that previously ran as separate passes:
 
-    Counts the number of triple-backtick openers that appear before line *i*.
-    An odd count means the line is inside a fence.
+      - consecutive ``>`` lines get two trailing spaces so they render as
+        hard line-breaks instead of collapsing into one paragraph;
+      - a blank line is inserted before a list item that directly follows
+        a prose paragraph, which some renderers require to start a list.
 
-    :param lines: All lines of the Markdown document.
-    :param i:     Zero-based index of the line to test.
-    :returns: Whether the line is inside a fenced code block.
-    """
-    return (
-        sum(1 for j in range(i) if lines[j].rstrip().startswith("```")) % 2 == 1
-    )
-
-
-def fix_blockquote_linebreaks(text: str) -> str:
-    """Append trailing double-spaces to consecutive blockquote lines.
-
-    Markdown requires two trailing spaces for a hard line-break.  Without
-    this fix, successive ``>`` lines collapse into a single paragraph inside
-    the rendered blockquote.
+    The fence state is carried forward while iterating, and output is
+    streamed into a single :class:`io.StringIO` buffer instead of a
+    second list of lines, so the text is split and materialised exactly
+    once.
 
     :param text: Full Markdown source.
-    :returns: Markdown with hard breaks inserted between blockquote lines.
+    :returns: Markdown with both fixes applied.
     """
     lines = text.split("\n")
-    result: list[str] = []
+    buf = io.StringIO()
+    write = buf.write
+    in_fence = False
+
     for i, line in enumerate(lines):
         s = line.rstrip()
-        if (
-            s.startswith(">")
-            and not _in_fence(lines, i)
-            and i + 1 < len(lines)
-            and lines[i + 1].rstrip().startswith(">")
-            and not s.endswith("  ")
-        ):
-            result.append(s + "  ")
-        else:
-            result.append(line)
-    return "\n".join(result)
+        if not in_fence:
+            if _LIST_BULLET_RE.match(s) and i > 0:
+                prev = lines[i - 1].rstrip()
+                if prev and not _LIST_BULLET_RE.match(prev) and not prev.startswith("#"):
+                    write("\n")
+            if (
+                s.startswith(">")
+                and i + 1 < len(lines)
+                and lines[i + 1].rstrip().startswith(">")
+                and not s.endswith("  ")
+            ):
+                line = s + "  "
+        write(line)
+        write("\n")
+        if s.startswith("```"):
+            in_fence = not in_fence
+
+    # Drop the separator written after the final line.
+    buf.seek(buf.tell() - 1)
+    buf.truncate()
+    return buf.getvalue()
 
 
 _CALLOUT_RE = re.compile(
@@ -563,20 +1117,31 @@ def convert_callouts(text: str) -> str:
     :returns: Markdown with callout blockquotes replaced by HTML divs.
     """
     lines = text.split("\n")
-    result: list[str] = []
+    buf = io.StringIO()
+    write = buf.write
+    in_fence = False
     i = 0
 
     while i < len(lines):
         line = lines[i]
 
-        if _in_fence(lines, i):
-            result.append(line)
+        if line.rstrip().startswith("```"):
+            in_fence = not in_fence
+            write(line)
+            write("\n")
+            i += 1
+            continue
+
+        if in_fence:
+            write(line)
+            write("\n")
             i += 1
             continue
 
         m = _CALLOUT_RE.match(line)
         if not m:
-            result.append(line)
+            write(line)
+            write("\n")
             i += 1
             continue
 
@@ -607,49 +1172,24 @@ def convert_callouts(text: str) -> str:
         body_md = "\n".join(body_lines).strip()
         body_html = _md_inline(body_md) if body_md else ""
 
-        safe_title = (
-            title.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        safe_title = escape(title, quote=False)
+
+        write(
+            f'\n<div class="callout callout-{canon}">\n'
+            '<div class="callout-header">\n'
+            f'<span class="callout-icon">{emoji}</span>\n'
+            f'<span class="callout-title">{safe_title}</span>\n'
+            "</div>\n"
+            '<div class="callout-body">\n'
+            f"{body_html}\n"
+            "</div>\n"
+            "</div>\n\n"
         )
 
-        html_parts = [
-            f'\n<div class="callout callout-{canon}">',
-            '<div class="callout-header">',
-            f'<span class="callout-icon">{emoji}</span>',
-            f'<span class="callout-title">{safe_title}</span>',
-            "</div>",
-            '<div class="callout-body">',
-            body_html,
-            "</div>",
-            "</div>\n",
-        ]
-
-        result.append("\n".join(html_parts))
-
-    return "\n".join(result)
-
-
-def fix_list_separation(text: str) -> str:
-    """Insert blank lines before list items that follow a prose paragraph.
-
-    Some Markdown renderers require a blank line before the first ``-`` or
-    ``1.`` to correctly start a list.  This pre-processor adds one when a
-    list item directly follows a non-list, non-heading line.
-
-    :param text: Full Markdown source.
-    :returns: Markdown with blank lines inserted where needed.
-    """
-    lines = text.split("\n")
-    result: list[str] = []
-    _list = re.compile(r"^\s*[-*]\s|^\s*\d+\.\s")
-
-    for i, line in enumerate(lines):
-        if _list.match(line.rstrip()) and not _in_fence(lines, i) and i > 0:
-            prev = lines[i - 1].rstrip()
-            if prev and not _list.match(prev) and not prev.startswith("#"):
-                result.append("")
-        result.append(line)
-
-    return "\n".join(result)
+    # Drop the separator written after the final line.
+    buf.seek(buf.tell() - 1)
+    buf.truncate()
+    return buf.getvalue()
 
 
 def build_cover_html(
@@ -668,10 +1208,10 @@ def build_cover_html(
     :returns: Complete HTML string for the cover ``<div>``.
     """
     parts = re.split(r"\s[—–:]\s", title, maxsplit=1)
-    main = parts[0].replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    main = escape(parts[0], quote=False)
     accent_html = ""
     if len(parts) > 1:
-        a = parts[1].replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        a = escape(parts[1], quote=False)
         accent_html = f'<span class="cover-title-accent">{a}</span>'
 
     sub_html = f'<p class="cover-sub">{subtitle}</p>' if subtitle else ""
@@ -806,9 +1346,7 @@ def build_html(
     :param cover_name: Cover style name (or ``None``).
     :returns: Full ``<!DOCTYPE html>`` string.
     """
-    safe_title = (
-        title.replace('"', "&quot;").replace("<", "&lt;").replace(">", "&gt;")
-    )
+    safe_title = escape(title)
     cover_html = (
         build_cover_html(title, subtitle, author, today) if show_cover else ""
     )
@@ -832,6 +1370,35 @@ def build_html(
 </html>"""
 
 
+def _render_pdf_chromium(html_path: str, output_path: str) -> None:
+    """Render the assembled HTML to PDF with headless Chromium.
+
+    Uses Playwright's bundled Chromium, whose layout engine handles
+    very large documents considerably faster than WeasyPrint's pure-
+    Python flow.  Imported lazily so the default WeasyPrint path never
+    pays for (or requires) the dependency.
+
+    :param html_path:   Path to the assembled HTML document.
+    :param output_path: Target PDF path.
+    """
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as pw:
+        browser = pw.chromium.launch()
+        try:
+            page = browser.new_page()
+            page.goto(Path(html_path).resolve().as_uri())
+            page.emulate_media(media="print")
+            page.pdf(
+                path=output_path,
+                format="A4",
+                print_background=True,
+                prefer_css_page_size=True,
+            )
+        finally:
+            browser.close()
+
+
 def convert(args: argparse.Namespace) -> None:
     """Run the full Markdown-to-PDF conversion pipeline.
 
@@ -854,6 +1421,11 @@ def convert(args: argparse.Namespace) -> None:
             print(f"\n   ⚠  No covers found in {COVERS_DIR}\n")
         return
 
+    global _MD_ENGINE, _DIAGRAM_FMT
+    _MD_ENGINE = getattr(args, "md_engine", None) or "markdown"
+    _DIAGRAM_FMT = "png" if getattr(args, "raster", False) else "svg"
+    _MISTUNE_SLUG_COUNTS.clear()
+
     input_path = args.input
     output_path = args.output or re.sub(r"\.md$", ".pdf", input_path)
     theme_path = Path(args.theme) if args.theme else DEFAULT_THEME
@@ -870,25 +1442,26 @@ def convert(args: argparse.Namespace) -> None:
     md_text = Path(input_path).read_text(encoding="utf-8")
     print(f"📖  Read {len(md_text):,} chars")
 
-    title_match = re.search(r"^#\s+(.+)$", md_text, re.M)
-    title = args.title or (
-        title_match.group(1).strip() if title_match else "Document"
-    )
+    if args.no_cache and CACHE_DIR.exists():
+        for f in CACHE_DIR.iterdir():
+            f.unlink()
+        print("🗑  Cleared diagram cache")
 
-    subtitle = args.subtitle or ""
-    if not subtitle and title_match:
-        after_title = md_text[title_match.end():]
-        sub_match = re.match(r"\s*\n\*([^*\n]+)\*\s*$", after_title, re.M)
-        if sub_match:
-            subtitle = sub_match.group(1).strip()
+    # Start the network-bound diagram renders now; the CPU-bound TOC and
+    # preprocessing below run while they are in flight.
+    count = prefetch_mermaid(md_text, args.no_cache)
+    print(f"🎨  Found {count} Mermaid diagram(s)")
 
+    doc_title, doc_subtitle, toc_items = scan_metadata(md_text)
+    title = args.title or doc_title or "Document"
+    subtitle = args.subtitle or doc_subtitle
     author = args.author or ""
 
     print(f"📌  Title    : {title}")
     print(f"   Subtitle : {subtitle or '(none)'}")
     print(f"   Author   : {author or '(none)'}")
 
-    toc_html = build_toc(md_text)
+    toc_html = build_toc(toc_items)
     print(f"📑  TOC: {toc_html.count('<li')} entries")
 
     front_md = ""
@@ -900,57 +1473,29 @@ def convert(args: argparse.Namespace) -> None:
         if front_md.strip():
             print("📄  Front matter: after generated TOC")
 
-    md_text = re.sub(
-        r"^## Table of Contents\s*\n[\s\S]*?(?=\n## |\n---|\Z)",
-        "",
-        md_text,
-        flags=re.M,
-    )
-    md_text = re.sub(
-        r"^## Table des matières\s*\n[\s\S]*?(?=\n## |\n---|\Z)",
-        "",
-        md_text,
-        flags=re.M,
-    )
+    md_text = _MANUAL_TOC_RE.sub("", md_text)
+    front_md = _MANUAL_TOC_RE.sub("", front_md)
 
-    front_md = re.sub(
-        r"^## Table of Contents\s*\n[\s\S]*?(?=\n## |\n---|\Z)",
-        "",
-        front_md,
-        flags=re.M,
-    )
-    front_md = re.sub(
-        r"^## Table des matières\s*\n[\s\S]*?(?=\n## |\n---|\Z)",
-        "",
-        front_md,
-        flags=re.M,
-    )
+    if _MD_ENGINE in ("markdown", "pyromark"):
+        # attr_list / heading_attributes turn the injected {#slug} markers
+        # into ids at render time; the mistune renderer slugifies headings
+        # itself.
+        slug_counts: dict[str, int] = defaultdict(int)
+        front_md = inject_heading_ids(front_md, slug_counts)
+        md_text = inject_heading_ids(md_text, slug_counts)
 
     front_md = convert_callouts(front_md)
-    front_md = fix_blockquote_linebreaks(front_md)
-    front_md = fix_list_separation(front_md)
+    front_md = preprocess_markdown(front_md)
 
     md_text = convert_callouts(md_text)
-    md_text = fix_blockquote_linebreaks(md_text)
-    md_text = fix_list_separation(md_text)
-
-    if args.no_cache and CACHE_DIR.exists():
-        for f in CACHE_DIR.iterdir():
-            f.unlink()
-        print("🗑  Cleared diagram cache")
+    md_text = preprocess_markdown(md_text)
 
-    count = len(re.findall(r"```mermaid", md_text))
-    print(f"\n🎨  Found {count} Mermaid diagram(s)")
     front_md = replace_mermaid_blocks(front_md, args.no_cache)
     md_text = replace_mermaid_blocks(md_text, args.no_cache)
 
     print("\n📝  Converting Markdown → HTML…")
-    front_html = render_markdown(front_md)
-    front_html = add_heading_ids(front_html)
-
-    body_html = render_markdown(md_text)
-
-    body_html = add_heading_ids(body_html)
+    front_html = render_markdown_cached(front_md)
+    body_html = render_markdown_cached(md_text)
     body_html = front_html + body_html
 
     full_html = build_html(
@@ -965,14 +1510,48 @@ def convert(args: argparse.Namespace) -> None:
         cover_name,
     )
 
-    html_path = re.sub(r"\.pdf$", ".html", output_path)
-    Path(html_path).write_text(full_html, encoding="utf-8")
-    print(f"🔍  Debug HTML → {html_path}")
-
-    print("\n🖨  Generating PDF with WeasyPrint…")
-    HTML(
-        string=full_html, base_url=str(Path(input_path).parent)
-    ).write_pdf(output_path)
+    # The renderers consume the document from disk (cheaper than
+    # re-encoding the string), so the HTML file always exists during
+    # rendering; without --debug-html it lives in a temp path that is
+    # removed afterwards instead of shadowing the output as {name}.html.
+    debug_html = getattr(args, "debug_html", False)
+    if debug_html:
+        html_path = re.sub(r"\.pdf$", ".html", output_path)
+    else:
+        fd, html_path = tempfile.mkstemp(suffix=".html")
+        os.close(fd)
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(full_html)
+    if debug_html:
+        print(f"🔍  Debug HTML → {html_path}")
+
+    try:
+        if getattr(args, "pdf_engine", "weasyprint") == "chromium":
+            print("\n🖨  Generating PDF with Chromium…")
+            _render_pdf_chromium(html_path, output_path)
+        else:
+            print("\n🖨  Generating PDF with WeasyPrint…")
+            doc = HTML(
+                filename=html_path, base_url=str(Path(input_path).parent)
+            )
+            # Stream into an open handle rather than letting WeasyPrint
+            # buffer the whole PDF and write it at the end; recompressing
+            # embedded images materially shrinks diagram-heavy output.
+            with open(output_path, "wb") as fh:
+                try:
+                    doc.write_pdf(
+                        target=fh,
+                        font_config=FONT_CONFIG,
+                        optimize_images=True,
+                        jpeg_quality=85,
+                    )
+                except TypeError:
+                    # image-optimization kwargs vary across WeasyPrint
+                    # releases; fall back to a plain render
+                    doc.write_pdf(target=fh, font_config=FONT_CONFIG)
+    finally:
+        if not debug_html:
+            os.unlink(html_path)
 
     kb = os.path.getsize(output_path) / 1024
     print(f"\n✅  Done → {output_path}  ({kb:.0f} KB)\n")
@@ -1003,14 +1582,74 @@ if __name__ == "__main__":
         action="store_true",
         help="List available cover styles and exit",
     )
+    p.add_argument(
+        "--md-engine",
+        choices=("markdown", "mistune", "pyromark"),
+        default="markdown",
+        help=(
+            "Markdown parser: 'markdown' (full extension set, default), "
+            "'mistune' (much faster single-pass parser, needs mistune>=3) "
+            "or 'pyromark' (native Rust parser, fastest, plain code blocks)"
+        ),
+    )
+    p.add_argument(
+        "--pdf-engine",
+        choices=("weasyprint", "chromium"),
+        default="weasyprint",
+        help=(
+            "PDF renderer: 'weasyprint' (default) or 'chromium' "
+            "(headless browser via Playwright, faster on huge documents)"
+        ),
+    )
     p.add_argument("--no-cover", action="store_true")
     p.add_argument("--no-cache", action="store_true")
+    p.add_argument(
+        "--debug-html",
+        action="store_true",
+        help="Keep the assembled HTML next to the PDF for inspection",
+    )
+    p.add_argument(
+        "--raster",
+        action="store_true",
+        help=(
+            "Render diagrams as PNGs referenced from the cache by "
+            "file:// URI instead of inline SVG"
+        ),
+    )
+    p.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "Read input paths from stdin, one per line, and convert each "
+            "in the same process (warm caches, fonts and connections)"
+        ),
+    )
     args = p.parse_args()
 
     if args.list_covers:
         convert(args)
         sys.exit(0)
 
+    if args.serve:
+        # Batch mode: each conversion reuses the already-loaded fonts,
+        # the pooled Kroki session and the in-memory diagram/section
+        # caches, so only the first document pays the warm-up cost.
+        print("👂  Serve mode — reading input paths from stdin")
+        for line in sys.stdin:
+            path = line.strip()
+            if not path:
+                continue
+            if not Path(path).exists():
+                print(f"✗  File not found: {path}")
+                continue
+            args.input = path
+            args.output = None
+            try:
+                convert(args)
+            except Exception as e:
+                print(f"✗  {path}: {e}")
+        sys.exit(0)
+
     if not args.input:
         p.error("the following arguments are required: input")
 